@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import chess
+import chess.engine
+import chess.polyglot
+
+from engine_pool import get_engine_pool
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_DEFAULT_DEPTH = 12
+ANALYSIS_MAX_DEPTH = 20
+ANALYSIS_MAX_MULTIPV = 5
+# Анализ идёт в отдельных пулах движков ("analysis:<движок>") и не занимает
+# процессы, которые делают ходы в партиях; здесь ограничено их общее число
+ANALYSIS_MAX_CONCURRENCY = int(os.environ.get("ANALYSIS_MAX_CONCURRENCY", "2"))
+EVAL_CACHE_SIZE = int(os.environ.get("EVAL_CACHE_SIZE", "10000"))
+
+
+class EvalCache:
+    """LRU-кэш оценок позиций по (zobrist-хэш, движок, глубина, multipv).
+
+    Хэш не учитывает счётчики ходов, поэтому в кэше хранится только вывод
+    движка (оценка, глубина, вариант в UCI); FEN и SAN строятся по доске.
+    """
+
+    def __init__(self, max_size: int = EVAL_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple, List[dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(board: chess.Board, engine_name: str, depth: int, multipv: int) -> Tuple:
+        return (chess.polyglot.zobrist_hash(board), engine_name, depth, multipv)
+
+    def get(self, key: Tuple) -> Optional[List[dict]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Tuple, value: List[dict]):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+eval_cache = EvalCache()
+_analysis_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _analysis_semaphore
+    if _analysis_semaphore is None:
+        _analysis_semaphore = asyncio.Semaphore(ANALYSIS_MAX_CONCURRENCY)
+    return _analysis_semaphore
+
+
+def score_to_dict(score: Optional[chess.engine.PovScore]) -> Dict[str, Optional[int]]:
+    """Оценка с точки зрения белых: сантипешки или мат в N ходов."""
+    if score is None:
+        return {"cp": None, "mate": None}
+    white = score.white()
+    return {"cp": white.score(), "mate": white.mate()}
+
+
+def info_to_line(info: chess.engine.InfoDict) -> dict:
+    return {
+        "score": score_to_dict(info.get("score")),
+        "depth": info.get("depth"),
+        "pv": [move.uci() for move in info.get("pv", [])],
+    }
+
+
+def build_result(board: chess.Board, engine_name: str, depth: int, lines: List[dict]) -> dict:
+    """Собирает ответ из вывода движка; FEN и SAN зависят от счётчиков ходов доски."""
+    lines = [
+        {**line, "pv_san": board.variation_san([chess.Move.from_uci(uci) for uci in line["pv"]])}
+        for line in lines
+    ]
+    return {
+        "fen": board.fen(),
+        "engine": engine_name,
+        "depth": depth,
+        "score": lines[0]["score"] if lines else score_to_dict(None),
+        "best_move": lines[0]["pv"][0] if lines and lines[0]["pv"] else None,
+        "pv": lines[0]["pv"] if lines else [],
+        "lines": lines,
+    }
+
+
+def board_at_ply(board: chess.Board, ply: int) -> chess.Board:
+    """Возвращает копию доски после первых ply полуходов партии."""
+    position = board.copy()
+    while len(position.move_stack) > ply:
+        position.pop()
+    return position
+
+
+async def analyse_position(board: chess.Board, engine_name: str, ai_info: dict,
+                           depth: int, multipv: int = 1) -> dict:
+    key = EvalCache.key(board, engine_name, depth, multipv)
+    cached = eval_cache.get(key)
+    if cached is not None:
+        return {**build_result(board, engine_name, depth, cached), "cached": True}
+
+    async with _get_semaphore():
+        pool = get_engine_pool(f"analysis:{engine_name}", ai_info, ANALYSIS_MAX_CONCURRENCY)
+        async with pool.acquire() as engine:
+            infos = await engine.analyse(board, chess.engine.Limit(depth=depth), multipv=multipv)
+
+    lines = [info_to_line(info) for info in infos]
+    eval_cache.put(key, lines)
+    logger.debug(f"Analysed {board.fen()} with {engine_name} at depth {depth}")
+    return {**build_result(board, engine_name, depth, lines), "cached": False}
+
+
+async def analyse_game(board: chess.Board, engine_name: str, ai_info: dict,
+                       depth: int, multipv: int = 1):
+    """Асинхронный генератор анализа каждого полухода партии, начиная с нулевого."""
+    for ply in range(len(board.move_stack) + 1):
+        position = board_at_ply(board, ply)
+        result = await analyse_position(position, engine_name, ai_info, depth, multipv)
+        move = board.move_stack[ply - 1].uci() if ply else None
+        yield {"ply": ply, "move": move, **result}
@@ -1,21 +1,58 @@
+import time
+_import_started = time.perf_counter()
+
 import logging
 import asyncio
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 import chess
 from typing import Dict, Optional, List
 import uuid
 from datetime import datetime
-from chess_ai import get_best_move, available_ais
+from chess_ai import get_best_move, available_ais, warm_up_ais
 from chess_engine import create_board, is_game_over, get_legal_moves, make_move, get_game_result
+from analysis import (
+    analyse_position, analyse_game, board_at_ply,
+    ANALYSIS_DEFAULT_DEPTH, ANALYSIS_MAX_DEPTH, ANALYSIS_MAX_MULTIPV,
+)
+from engine_pool import close_engine_pools
+from serialization import dumps, encoded_response
+from broadcast import GameHub, HubFull, get_hub, open_hub, close_hub, hubs
 
 # Configure logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)  # Changed from DEBUG to INFO
 logging.getLogger("uvicorn.access").setLevel(logging.WARNING)  # Suppress Uvicorn access logs below WARNING
 
-app = FastAPI()
+startup = {
+    "ready": False,
+    "timings": {"import": round(time.perf_counter() - _import_started, 3)},
+    "errors": {},
+}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    timings, errors = await warm_up_ais()
+    startup["timings"].update(timings)
+    startup["timings"]["warm_up"] = round(time.perf_counter() - started, 3)
+    startup["errors"] = errors
+    startup["ready"] = True
+    logger.info(f"Backend ready, startup timings: {startup['timings']}")
+    yield
+    startup["ready"] = False
+    for game_id, task in ai_tasks.items():
+        task.cancel()
+        logger.info(f"AI task for game {game_id} canceled during shutdown")
+    ai_tasks.clear()
+    for game_id in list(hubs):
+        close_hub(game_id)
+    await close_engine_pools()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -69,6 +106,10 @@ PIECE_VALUES = {
     'q': 9, 'Q': 9,
 }
 
+@app.get("/health/ready")
+async def health_ready():
+    return JSONResponse(status_code=200 if startup["ready"] else 503, content=startup)
+
 @app.post("/api/game/start")
 async def start_game(config: GameConfig):
     if len(config.player1) > 20 or (config.player2 and len(config.player2) > 20):
@@ -132,28 +173,80 @@ async def start_game(config: GameConfig):
     logger.info(f"Игра {game_id} начата: {config.mode}, player1={config.player1}, player2={player2}")
     return {"game_id": game_id, "player2": player2}
 
+def build_state(game_id: str, game: Dict, since: int = 0) -> Dict:
+    """Состояние партии обычным словарём: поля GameState без валидации pydantic."""
+    board = game["board"]
+    return {
+        "game_id": game_id,
+        "board": board.fen(),
+        "turn": "белые" if board.turn else "чёрные",
+        "moves": game["moves"][since:] if since else game["moves"],
+        "game_over": game["game_over"],
+        "winner": game["winner"],
+        "ai_thinking": game.get("ai_thinking", False),
+        "mode": game["mode"],
+        "player1": game["player1"],
+        "player2": game["player2"],
+        "captured_by_player1": game["captured_by_player1"],
+        "captured_by_player2": game["captured_by_player2"],
+    }
+
+def encoded_state(game_id: str, game: Dict) -> Dict:
+    """Закодированное состояние, общее для всех опросов до следующего изменения партии."""
+    key = (len(game["moves"]), game["game_over"], game["winner"], game.get("ai_thinking", False))
+    cached = game.get("state_cache")
+    if not cached or cached["key"] != key:
+        cached = game["state_cache"] = {
+            "key": key,
+            "body": dumps(build_state(game_id, game)),
+            "compressed": {},
+        }
+    return cached
+
+def publish_state(game_id: str, game: Dict):
+    """Отправляет состояние зрителям партии; без зрителей ничего не делает."""
+    hub = get_hub(game_id)
+    if hub is not None:
+        publish_to_hub(hub, game_id, game)
+
+def publish_to_hub(hub: GameHub, game_id: str, game: Dict):
+    """Итоговое состояние завершённой партии уходит событием end, после чего хаб закрывается."""
+    if game["game_over"]:
+        hub.publish(encoded_state(game_id, game)["body"], event="end")
+        close_hub(game_id)
+    else:
+        hub.publish(encoded_state(game_id, game)["body"])
+
 @app.get("/api/game/state", response_model=GameState)
-async def get_state(game_id: str):
+async def get_state(game_id: str, request: Request, since: int = 0):
     game = games.get(game_id)
     if not game:
         logger.error(f"Game {game_id} not found")
         raise HTTPException(status_code=404, detail="Игра не найдена")
     
-    board = game["board"]
-    return GameState(
-        game_id=game_id,
-        board=board.fen(),
-        turn="белые" if board.turn else "чёрные",
-        moves=[move.uci() for move in board.move_stack],
-        game_over=game["game_over"],
-        winner=game["winner"],
-        ai_thinking=game.get("ai_thinking", False),
-        mode=game["mode"],
-        player1=game["player1"],
-        player2=game["player2"],
-        captured_by_player1=game["captured_by_player1"],
-        captured_by_player2=game["captured_by_player2"],
-    )
+    accept_encoding = request.headers.get("accept-encoding")
+    if since > 0:
+        # Клиент уже знает первые since ходов — отдаём только новые
+        return encoded_response(dumps(build_state(game_id, game, since)), accept_encoding)
+    cached = encoded_state(game_id, game)
+    return encoded_response(cached["body"], accept_encoding, cached["compressed"])
+
+@app.get("/api/game/watch")
+async def watch_game(game_id: str):
+    game = games.get(game_id)
+    if not game:
+        logger.error(f"Game {game_id} not found")
+        raise HTTPException(status_code=404, detail="Игра не найдена")
+    
+    hub = open_hub(game_id)
+    try:
+        frames = hub.subscribe()
+    except HubFull:
+        logger.warning(f"Spectator limit reached for game {game_id}")
+        raise HTTPException(status_code=503, detail="Слишком много зрителей")
+    if hub.seq == 0:
+        publish_to_hub(hub, game_id, game)
+    return StreamingResponse(frames, media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @app.get("/api/game/select")
 async def select_square(game_id: str, square: str):
@@ -259,7 +352,8 @@ async def make_move_endpoint(move: MoveRequest, background_tasks: BackgroundTask
             logger.info(f"Scheduling AI move for {'white' if board.turn else 'black'} in game {move.game_id}")
             background_tasks.add_task(make_ai_move, move.game_id)
     
-    return {"success": True, "state": await get_state(move.game_id)}
+    publish_state(move.game_id, game)
+    return {"success": True, "state": build_state(move.game_id, game)}
 
 @app.post("/api/game/surrender")
 async def surrender_game(surrender: SurrenderRequest):
@@ -295,7 +389,8 @@ async def surrender_game(surrender: SurrenderRequest):
         game["scores_updated"] = True
         logger.info(f"Scores updated for game {surrender.game_id}: {score}")
     
-    return {"success": True, "state": await get_state(surrender.game_id)}
+    publish_state(surrender.game_id, game)
+    return {"success": True, "state": build_state(surrender.game_id, game)}
 
 @app.post("/api/game/stop")
 async def stop_game(game_id: str):
@@ -315,6 +410,7 @@ async def stop_game(game_id: str):
         logger.info(f"AI task for game {game_id} canceled")
     
     del games[game_id]
+    close_hub(game_id)
     logger.info(f"Game {game_id} stopped")
     return {"success": True}
 
@@ -339,6 +435,54 @@ async def get_game_score(game_id: str):
         "score": f"{score['scores'][score['player1']]['wins']} - {score['scores'][score['player2']]['wins']}"
     }
 
+@app.get("/api/game/analyze")
+async def analyze_game(
+    game_id: str,
+    ply: Optional[int] = None,
+    depth: int = ANALYSIS_DEFAULT_DEPTH,
+    multipv: int = 1,
+    engine: str = "stockfish",
+    full_game: bool = False,
+):
+    game = games.get(game_id)
+    if not game:
+        logger.error(f"Game {game_id} not found")
+        raise HTTPException(status_code=404, detail="Игра не найдена")
+    
+    ai_info = available_ais.get(engine)
+    if not ai_info or ai_info["type"] != "uci":
+        raise HTTPException(status_code=400, detail="Движок недоступен для анализа")
+    
+    if not 1 <= depth <= ANALYSIS_MAX_DEPTH or not 1 <= multipv <= ANALYSIS_MAX_MULTIPV:
+        raise HTTPException(status_code=400, detail="Недопустимые параметры анализа")
+    
+    board = game["board"].copy()
+    if full_game:
+        async def stream():
+            ply = 0
+            try:
+                async for result in analyse_game(board, engine, ai_info, depth, multipv):
+                    yield dumps(result) + b"\n"
+                    ply = result["ply"] + 1
+            except Exception as e:
+                # Заголовки уже отправлены, поэтому ошибка сообщается последней строкой потока
+                logger.error(f"Full analysis failed for game {game_id} at ply {ply}: {e}")
+                yield dumps({"ply": ply, "error": "Анализ недоступен"}) + b"\n"
+        logger.info(f"Streaming full analysis for game {game_id}, {len(board.move_stack)} plies")
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+    
+    if ply is None:
+        ply = len(board.move_stack)
+    if not 0 <= ply <= len(board.move_stack):
+        raise HTTPException(status_code=400, detail="Недопустимый номер полухода")
+    
+    try:
+        result = await analyse_position(board_at_ply(board, ply), engine, ai_info, depth, multipv)
+    except Exception as e:
+        logger.error(f"Analysis failed for game {game_id} at ply {ply}: {e}")
+        raise HTTPException(status_code=503, detail="Анализ недоступен")
+    return {"game_id": game_id, "ply": ply, **result}
+
 async def make_ai_move(game_id: str):
     game = games.get(game_id)
     if not game:
@@ -350,6 +494,7 @@ async def make_ai_move(game_id: str):
         return
     
     game["ai_thinking"] = True
+    publish_state(game_id, game)
     logger.info(f"AI thinking for game {game_id}, turn: {'white' if game['board'].turn else 'black'}")
     
     try:
@@ -419,6 +564,7 @@ async def make_ai_move(game_id: str):
                 logger.info(f"Scores updated for game {game_id}: {score}")
             
         if game["mode"] == "aivai" and not game["game_over"]:
+            publish_state(game_id, game)
             await asyncio.sleep(2)
             logger.info(f"Scheduling next AI move for game {game_id}")
             ai_tasks[game_id] = asyncio.create_task(make_ai_move(game_id))
@@ -429,10 +575,4 @@ async def make_ai_move(game_id: str):
         game["winner"] = "Ошибка ИИ"
     finally:
         game["ai_thinking"] = False
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    for game_id, task in ai_tasks.items():
-        task.cancel()
-        logger.info(f"AI task for game {game_id} canceled during shutdown")
-    ai_tasks.clear()
\ No newline at end of file
+        publish_state(game_id, game)
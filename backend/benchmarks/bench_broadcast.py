@@ -0,0 +1,85 @@
+"""Стоимость раздачи кадров партии ИИ против ИИ тысяче зрителей.
+
+Сравнивает общий хаб (кадр кодируется один раз) с опросом, когда каждый
+зритель сам собирает и кодирует состояние. Запуск из каталога backend:
+    python benchmarks/bench_broadcast.py --watchers 1000 --moves 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import build_state, encoded_state  # noqa: E402
+from bench_state import long_game  # noqa: E402
+from broadcast import GameHub  # noqa: E402
+from serialization import dumps  # noqa: E402
+
+
+async def run_hub(watchers: int, moves: int, game: dict) -> dict:
+    hub = GameHub("bench", max_spectators=watchers)
+    all_moves = game["moves"]
+    game["moves"] = all_moves[:1]
+    hub.publish(encoded_state("bench", game)["body"])
+    received = [0] * watchers
+
+    async def watch(index: int):
+        async for _ in hub.subscribe():
+            received[index] += 1
+
+    tasks = [asyncio.create_task(watch(index)) for index in range(watchers)]
+    await asyncio.sleep(0)
+
+    publish_time = 0.0
+    started = time.perf_counter()
+    for ply in range(2, moves + 2):
+        game["moves"] = all_moves[:ply]
+        publish_started = time.perf_counter()
+        hub.publish(encoded_state("bench", game)["body"])
+        publish_time += time.perf_counter() - publish_started
+        await asyncio.sleep(0)  # все зрители забирают кадр
+    hub.close()
+    await asyncio.gather(*tasks)
+    total = time.perf_counter() - started
+    return {
+        "publish_us": publish_time / moves * 1e6,
+        "fanout_us": total / moves * 1e6,
+        "frames": sum(received),
+        "dropped": hub.dropped,
+        "hub_bytes": hub.memory_bytes,
+    }
+
+
+def run_polling(watchers: int, moves: int, game: dict) -> float:
+    started = time.perf_counter()
+    for _ in range(moves):
+        for _ in range(watchers):
+            dumps(build_state("bench", game))
+    return (time.perf_counter() - started) / moves * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--watchers", type=int, default=1000)
+    parser.add_argument("--moves", type=int, default=200)
+    args = parser.parse_args()
+
+    game = long_game(args.moves + 2)
+    args.moves = min(args.moves, len(game["moves"]) - 2)
+    result = asyncio.run(run_hub(args.watchers, args.moves, game))
+    polling_us = run_polling(args.watchers, min(args.moves, 20), game)
+
+    print(f"watchers: {args.watchers}, moves: {args.moves}")
+    print(f"hub: publish {result['publish_us']:.1f} us/move, "
+          f"fan-out incl. delivery {result['fanout_us']:.0f} us/move "
+          f"({result['fanout_us'] / args.watchers:.2f} us/watcher)")
+    print(f"hub: {result['frames']} frames delivered, {result['dropped']} dropped, "
+          f"{result['hub_bytes']} bytes buffered")
+    print(f"polling: {polling_us:.0f} us/move to encode state once per watcher "
+          f"({polling_us / args.watchers:.2f} us/watcher), excluding HTTP overhead")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Байты и CPU на один опрос /api/game/state для длинной партии ИИ против ИИ.
+
+Запуск из каталога backend:
+    python benchmarks/bench_state.py --plies 300 --polls 2000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import chess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from app import GameState, build_state, encoded_state  # noqa: E402
+from serialization import compress, brotli, orjson  # noqa: E402
+
+
+def long_game(plies: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    board = chess.Board()
+    moves, captured_white, captured_black = [], [], []
+    while len(moves) < plies and not board.is_game_over():
+        move = rng.choice(list(board.legal_moves))
+        captured = board.piece_at(move.to_square)
+        if captured:
+            (captured_white if board.turn else captured_black).append(captured.symbol())
+        board.push(move)
+        moves.append(move.uci())
+    return {
+        "board": board, "mode": "aivai", "player1": "ИИ", "player2": "ИИ", "moves": moves,
+        "game_over": False, "winner": None, "ai_thinking": False,
+        "captured_by_player1": captured_white, "captured_by_player2": captured_black,
+    }
+
+
+def per_call_us(fn, polls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(polls):
+        fn()
+    return (time.perf_counter() - started) / polls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plies", type=int, default=300)
+    parser.add_argument("--polls", type=int, default=2000)
+    args = parser.parse_args()
+
+    game = long_game(args.plies)
+    game_id = "bench"
+
+    def pydantic_path():
+        # Прежний путь: модель, валидация response_model и json.dumps в JSONResponse
+        state = GameState(**build_state(game_id, game))
+        return GameState.model_validate(jsonable_encoder(state)).model_dump_json().encode()
+
+    def lean_uncached():
+        game.pop("state_cache", None)
+        return encoded_state(game_id, game)["body"]
+
+    def lean_cached():
+        return encoded_state(game_id, game)["body"]
+
+    body = lean_cached()
+    print(f"plies: {len(game['moves'])}")
+    print(f"{'path':<22}{'us/poll':>10}")
+    print(f"{'pydantic':<22}{per_call_us(pydantic_path, args.polls):>10.1f}")
+    print(f"{'lean, uncached':<22}{per_call_us(lean_uncached, args.polls):>10.1f}")
+    print(f"{'lean, cached':<22}{per_call_us(lean_cached, args.polls):>10.1f}")
+    print()
+    print(f"{'encoding':<22}{'bytes/poll':>10}{'us/encode':>12}")
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    for encoding in encodings:
+        size = len(compress(body, encoding))
+        cost = per_call_us(lambda: compress(body, encoding), max(args.polls // 10, 1))
+        print(f"{encoding:<22}{size:>10}{cost:>12.1f}")
+    print(f"json encoder: {'orjson' if orjson is not None else 'json'}; "
+          "compressed bodies are cached per state, so encoding is paid once per move")
+
+
+if __name__ == "__main__":
+    main()
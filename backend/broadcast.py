@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_SPECTATORS_PER_GAME = int(os.environ.get("MAX_SPECTATORS_PER_GAME", "1000"))
+# Сколько последних кадров хранит хаб: это же максимальное отставание зрителя,
+# после которого он пропускает накопившиеся кадры и получает сразу последний
+SPECTATOR_MAX_LAG = int(os.environ.get("SPECTATOR_MAX_LAG", "8"))
+HUB_MAX_BYTES = int(os.environ.get("HUB_MAX_BYTES", str(256 * 1024)))
+
+
+class HubFull(Exception):
+    pass
+
+
+class GameHub:
+    """Рассылка кадров состояния одной партии всем зрителям.
+
+    Кадр кодируется один раз при публикации и хранится в общем кольцевом
+    буфере; у зрителя есть только курсор на последний полученный кадр, так что
+    стоимость публикации не зависит от числа зрителей.
+    """
+
+    def __init__(self, game_id: str, max_spectators: int = MAX_SPECTATORS_PER_GAME,
+                 max_lag: int = SPECTATOR_MAX_LAG, max_bytes: int = HUB_MAX_BYTES):
+        self.game_id = game_id
+        self.max_spectators = max_spectators
+        self.max_lag = max_lag
+        self.max_bytes = max_bytes
+        self.frames: Deque[Tuple[int, bytes]] = deque()
+        self.memory_bytes = 0
+        self.seq = 0
+        self.spectators = 0
+        self.dropped = 0
+        self.closed = False
+        self._wakeup = asyncio.Event()
+
+    def publish(self, payload: bytes, event: Optional[str] = None):
+        """Добавляет кадр Server-Sent Events и будит всех ожидающих зрителей.
+
+        event задаёт имя события SSE; без него кадр приходит как message.
+        """
+        self.seq += 1
+        if event:
+            frame = b"id: %d\nevent: %s\ndata: %s\n\n" % (self.seq, event.encode(), payload)
+        else:
+            frame = b"id: %d\ndata: %s\n\n" % (self.seq, payload)
+        self.frames.append((self.seq, frame))
+        self.memory_bytes += len(frame)
+        while len(self.frames) > self.max_lag or (self.memory_bytes > self.max_bytes and len(self.frames) > 1):
+            _, old = self.frames.popleft()
+            self.memory_bytes -= len(old)
+        self._wake()
+
+    def close(self):
+        self.closed = True
+        self._wake()
+
+    def _wake(self):
+        wakeup, self._wakeup = self._wakeup, asyncio.Event()
+        wakeup.set()
+
+    def frames_after(self, cursor: int) -> List[bytes]:
+        if not self.frames or cursor >= self.seq:
+            return []
+        oldest = self.frames[0][0]
+        if cursor < oldest - 1:
+            # Зритель отстал больше, чем хранит буфер: отдаём только последний кадр
+            self.dropped += self.seq - cursor - 1
+            return [self.frames[-1][1]]
+        return [frame for _, frame in islice(self.frames, cursor - oldest + 1, None)]
+
+    @property
+    def full(self) -> bool:
+        return self.spectators >= self.max_spectators
+
+    def subscribe(self) -> "Subscription":
+        """Поток кадров для одного зрителя, начиная с текущего состояния.
+
+        Место зрителя занимается сразу, вместе с проверкой лимита, поэтому
+        лишние подключения получают HubFull, а не пустой поток.
+        """
+        if self.full:
+            raise HubFull(self.game_id)
+        return Subscription(self, self.seq - 1 if self.frames else 0)
+
+    async def _stream(self, cursor: int) -> AsyncIterator[bytes]:
+        while True:
+            frames = self.frames_after(cursor)
+            if frames:
+                cursor = self.seq
+                for frame in frames:
+                    yield frame
+                continue
+            if self.closed:
+                return
+            await self._wakeup.wait()
+
+
+class Subscription:
+    """Место зрителя в хабе и его поток кадров.
+
+    Место освобождается ровно один раз: по окончании или обрыве потока, в
+    aclose() или при сборке объекта, даже если поток так и не начали читать.
+    """
+
+    def __init__(self, hub: GameHub, cursor: int):
+        self.hub = hub
+        self._frames = hub._stream(cursor)
+        self._released = False
+        hub.spectators += 1
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> bytes:
+        try:
+            return await self._frames.__anext__()
+        except BaseException:
+            self._release()
+            raise
+
+    async def aclose(self):
+        try:
+            await self._frames.aclose()
+        finally:
+            self._release()
+
+    def _release(self):
+        if not self._released:
+            self._released = True
+            self.hub.spectators -= 1
+
+    def __del__(self):
+        self._release()
+
+
+hubs: Dict[str, GameHub] = {}
+
+
+def get_hub(game_id: str) -> Optional[GameHub]:
+    return hubs.get(game_id)
+
+
+def open_hub(game_id: str) -> GameHub:
+    hub = hubs.get(game_id)
+    if hub is None:
+        hub = hubs[game_id] = GameHub(game_id)
+        logger.info(f"Broadcast hub opened for game {game_id}")
+    return hub
+
+
+def close_hub(game_id: str):
+    hub = hubs.pop(game_id, None)
+    if hub is not None:
+        hub.close()
+        logger.info(f"Broadcast hub closed for game {game_id}, dropped frames: {hub.dropped}")
@@ -2,17 +2,29 @@ import logging
 import chess
 import chess.engine
 import numpy as np
-import tensorflow as tf
-from tensorflow import keras
-from typing import Optional
-import os.path
+from typing import Dict, List, Optional, Tuple
+import os
+import time
+import sys
+import threading
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from engine_pool import get_engine_pool
+from engines.numbfish.numbfish import Searcher, MATE
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 custom_light_model = None
 
+NUMFISH_COMMAND = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "engines", "numbfish", "numbfish.py")]
+# Поиски numbfish идут в своём небольшом пуле потоков, чтобы ожидающие ходы не
+# занимали потоки executor'а по умолчанию, где работают keras-модели; у каждого
+# потока свой Searcher с таблицей транспозиций размером NUMFISH_TT_SIZE
+NUMFISH_WORKERS = int(os.environ.get("NUMFISH_WORKERS", "2"))
+numfish_executor = ThreadPoolExecutor(max_workers=NUMFISH_WORKERS, thread_name_prefix="numfish")
+_numfish_local = threading.local()
+
 available_ais = {
     "stockfish": {
         "type": "uci",
@@ -20,26 +32,43 @@ available_ais = {
         "depth": 3,
         "skill_level": 20
     },
+    # Встроенный движок numbfish в процессе приложения. Для запуска отдельным
+    # процессом через пул движков: {"type": "uci", "command": NUMFISH_COMMAND, "depth": 4}
     "numfish": {
-        "type": "uci",
-        "path": "/usr/games/stockfish",
-        "depth": 3,
-        "skill_level": 10  # Пониженный уровень сложности для имитации средней модели
+        "type": "numfish",
+        "movetime": 0.5
     },
+    # search_depth > 0 включает поиск на search_depth полуходов по search_width
+    # лучшим по политике ходам; movetime — бюджет на ход в секундах (начатый
+    # вызов модели не прерывается, поэтому возможен небольшой перерасход)
     "custom_light": {
         "type": "keras",
-        "path": "custom_light"
+        "path": "custom_light",
+        "search_depth": 0,
+        "search_width": 4,
+        "movetime": 1.0
     }
 }
 
+# ENABLED_AIS="stockfish,numfish" оставляет только перечисленные ИИ;
+# без keras-моделей TensorFlow вообще не импортируется
+_enabled_ais = os.environ.get("ENABLED_AIS")
+if _enabled_ais:
+    _enabled = {name.strip() for name in _enabled_ais.split(",")}
+    available_ais = {name: info for name, info in available_ais.items() if name in _enabled}
+
 class ChessAIModel:
     def __init__(self, model):
+        import tensorflow as tf  # тяжёлый импорт только при реальном использовании модели
         self.model = model
+        self._predict = tf.function(self._call, reduce_retracing=True)
 
-    @tf.function(reduce_retracing=True)
-    def predict(self, input_data):
+    def _call(self, input_data):
         return self.model(input_data, training=False)
 
+    def predict(self, input_data):
+        return self._predict(input_data)
+
 def load_custom_light_model():
     global custom_light_model
     if custom_light_model is None:
@@ -48,6 +77,7 @@ def load_custom_light_model():
             logger.error(f"Custom light model file not found at {model_path}")
             return None
         try:
+            from tensorflow import keras
             model = keras.models.load_model(model_path)
             custom_light_model = ChessAIModel(model)
             logger.info("Custom light model loaded successfully")
@@ -106,7 +136,92 @@ def predictions_to_move(predictions, board: chess.Board, ai_name: str) -> Option
             return best_move
     return None
 
-async def get_best_move(board: chess.Board, ai_name: str, depth: int = 3, skill_level: int = 20) -> Optional[chess.Move]:
+def rank_moves(board: chess.Board, from_probs: np.ndarray, to_probs: np.ndarray) -> List[Tuple[chess.Move, float]]:
+    """Легальные ходы по убыванию from_prob * to_prob для одной позиции."""
+    scored = [
+        (move, float(from_probs[move.from_square] * to_probs[move.to_square]))
+        for move in board.legal_moves
+    ]
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored
+
+class PolicyNode:
+    __slots__ = ("board", "move", "children")
+
+    def __init__(self, board: chess.Board, move: Optional[chess.Move] = None):
+        self.board = board
+        self.move = move
+        self.children: List["PolicyNode"] = []
+
+    def value(self, searcher: Searcher, ply: int = 0) -> int:
+        """Негамакс-оценка узла с точки зрения стороны, которая ходит.
+
+        Листья оцениваются поиском взятий numbfish, чтобы на горизонте не
+        выглядели выгодными взятия защищённых фигур.
+        """
+        if not self.children:
+            if self.board.is_checkmate():
+                return -MATE + ply
+            if self.board.is_stalemate() or self.board.is_insufficient_material():
+                return 0
+            return searcher.quiesce(self.board)
+        return max(-child.value(searcher, ply + 1) for child in self.children)
+
+def policy_search(board: chess.Board, model, depth: int, width: int,
+                  movetime: Optional[float] = None) -> Optional[chess.Move]:
+    """Поиск по дереву из width лучших по политике ходов на depth полуходов.
+
+    Все позиции одного уровня оцениваются моделью одним батчем, поэтому на ход
+    тратится depth вызовов модели. Листья оцениваются поиском взятий numbfish
+    (материал и таблицы фигура-поле после разменов). Срок movetime проверяется и между уровнями, и внутри
+    уровня: нераскрытые к сроку узлы остаются листьями. Корень раскрывается
+    всегда, а уже начатый вызов модели не прерывается.
+    """
+    started = time.perf_counter()
+    deadline = started + movetime if movetime else None
+
+    def out_of_time(current_depth: int) -> bool:
+        return current_depth > 0 and deadline is not None and time.perf_counter() > deadline
+
+    root = PolicyNode(board.copy(stack=False))
+    layer = [root]
+    for current_depth in range(depth):
+        if out_of_time(current_depth):
+            break
+        inputs, expanded = [], []
+        for node in layer:
+            if out_of_time(current_depth):
+                break
+            if not node.board.is_game_over():
+                inputs.append(board_to_input(node.board, "custom_light"))
+                expanded.append(node)
+        if not expanded:
+            break
+        from_probs, to_probs = model.predict(np.concatenate(inputs))
+        from_probs = np.asarray(from_probs).reshape(len(expanded), 64)
+        to_probs = np.asarray(to_probs).reshape(len(expanded), 64)
+
+        next_layer = []
+        for node, node_from, node_to in zip(expanded, from_probs, to_probs):
+            if out_of_time(current_depth):
+                break
+            for move, _ in rank_moves(node.board, node_from, node_to)[:width]:
+                child_board = node.board.copy(stack=False)
+                child_board.push(move)
+                child = PolicyNode(child_board, move)
+                node.children.append(child)
+                next_layer.append(child)
+        layer = next_layer
+
+    if not root.children:
+        return next(iter(board.legal_moves), None)
+    # Дети упорядочены по политике, поэтому при равной оценке выигрывает ход модели
+    searcher = Searcher()
+    best_child = max(root.children, key=lambda child: -child.value(searcher, 1))
+    logger.debug(f"Policy search chose {best_child.move.uci()} in {time.perf_counter() - started:.3f}s")
+    return best_child.move
+
+async def get_best_move(board: chess.Board, ai_name: str) -> Optional[chess.Move]:
     ai_info = available_ais.get(ai_name)
     if not ai_info:
         logger.warning(f"AI configuration not found for {ai_name}")
@@ -114,44 +229,52 @@ async def get_best_move(board: chess.Board, ai_name: str, depth: int = 3, skill_
 
     try:
         if ai_info["type"] == "uci":
-            return await get_best_move_uci(board, ai_info, depth, skill_level)
+            return await get_best_move_uci(board, ai_name, ai_info)
+        elif ai_info["type"] == "numfish":
+            return await run_numfish(board, ai_info)
         elif ai_info["type"] == "keras":
-            return get_best_move_keras(board, ai_info)
+            return await asyncio.to_thread(get_best_move_keras, board.copy(), ai_info)
     except Exception as e:
         logger.error(f"Error getting best move for {ai_name}: {e}")
         return None
 
-async def get_best_move_uci(board: chess.Board, ai_info: dict, depth: int, skill_level: int) -> Optional[chess.Move]:
-    command = ai_info.get("command") or ai_info.get("path")
-    if not command:
-        logger.error(f"No command or path for UCI engine {ai_info}")
-        return None
-
+async def get_best_move_uci(board: chess.Board, ai_name: str, ai_info: dict) -> Optional[chess.Move]:
     try:
-        transport, engine = await chess.engine.popen_uci(command)
-        await engine.configure({"Skill Level": ai_info["skill_level"]})  # Используем skill_level из ai_info
-        logger.debug(f"Using UCI engine {ai_info['path']} with skill_level={ai_info['skill_level']}")
-        result = await engine.play(
-            board,
-            chess.engine.Limit(depth=ai_info["depth"]),
-            info=chess.engine.INFO_ALL
-        )
+        async with get_engine_pool(ai_name, ai_info).acquire() as engine:
+            logger.debug(f"Using UCI engine {ai_name} with skill_level={ai_info.get('skill_level')}")
+            result = await engine.play(board, chess.engine.Limit(depth=ai_info["depth"]))
         move = result.move
-        await engine.quit()
         if move and move in board.legal_moves:
-            logger.debug(f"UCI engine {ai_info['path']} returned move: {move.uci()}")
+            logger.debug(f"UCI engine {ai_name} returned move: {move.uci()}")
             return move
-        logger.warning(f"UCI engine {ai_info['path']} returned invalid move: {move}")
+        logger.warning(f"UCI engine {ai_name} returned invalid move: {move}")
         return None
     except Exception as e:
-        logger.error(f"Error in UCI engine {ai_info['path']}: {e}")
+        logger.error(f"Error in UCI engine {ai_name}: {e}")
         return None
-    finally:
-        try:
-            if 'engine' in locals():
-                await engine.quit()
-        except Exception:
-            pass
+
+def get_numfish_searcher() -> Searcher:
+    searcher = getattr(_numfish_local, "searcher", None)
+    if searcher is None:
+        searcher = _numfish_local.searcher = Searcher()
+    return searcher
+
+async def run_numfish(board: chess.Board, ai_info: dict) -> Optional[chess.Move]:
+    """Ход numbfish в numfish_executor; отмена задачи останавливает начатый поиск."""
+    stop_event = threading.Event()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(numfish_executor, get_best_move_numfish, board.copy(), ai_info, stop_event)
+    except asyncio.CancelledError:
+        stop_event.set()
+        raise
+
+def get_best_move_numfish(board: chess.Board, ai_info: dict,
+                          stop_event: Optional[threading.Event] = None) -> Optional[chess.Move]:
+    result = get_numfish_searcher().search(board, movetime=ai_info.get("movetime"),
+                                           depth=ai_info.get("depth"), stop_event=stop_event)
+    logger.debug(f"Numfish returned move {result.move} at depth {result.depth}, {result.nodes} nodes")
+    return result.move
 
 def get_best_move_keras(board: chess.Board, ai_info: dict) -> Optional[chess.Move]:
     model = load_custom_light_model()
@@ -159,12 +282,34 @@ def get_best_move_keras(board: chess.Board, ai_info: dict) -> Optional[chess.Mov
         logger.error("Custom light model not loaded")
         return None
     try:
-        input_data = board_to_input(board, ai_info["path"])
-        predictions = model.predict(input_data)
-        move = predictions_to_move(predictions, board, ai_info["path"])
+        if ai_info.get("search_depth", 0) > 0:
+            move = policy_search(board, model, ai_info["search_depth"],
+                                 ai_info.get("search_width", 4), ai_info.get("movetime"))
+        else:
+            input_data = board_to_input(board, ai_info["path"])
+            predictions = model.predict(input_data)
+            move = predictions_to_move(predictions, board, ai_info["path"])
         if move:
             logger.debug(f"Keras model {ai_info['path']} returned move: {move.uci()}")
         return move
     except Exception as e:
         logger.error(f"Error in keras model {ai_info['path']}: {e}")
-        return None
\ No newline at end of file
+        return None
+
+async def warm_up_ais() -> Tuple[Dict[str, float], Dict[str, str]]:
+    """Загружает модели и запускает пулы движков; возвращает время и ошибки по каждому ИИ."""
+    timings: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    for ai_name, ai_info in available_ais.items():
+        started = time.perf_counter()
+        try:
+            if ai_info["type"] == "uci":
+                await get_engine_pool(ai_name, ai_info).warm_up()
+            elif ai_info["type"] == "keras":
+                if await asyncio.to_thread(load_custom_light_model) is None:
+                    errors[ai_name] = "model not loaded"
+        except Exception as e:
+            logger.error(f"Warm-up failed for {ai_name}: {e}")
+            errors[ai_name] = str(e)
+        timings[ai_name] = round(time.perf_counter() - started, 3)
+    return timings, errors
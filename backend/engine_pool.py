@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+import chess.engine
+
+logger = logging.getLogger(__name__)
+
+# Сколько процессов одного UCI-движка может работать одновременно
+ENGINE_POOL_SIZE = int(os.environ.get("ENGINE_POOL_SIZE", "2"))
+
+
+class EnginePool:
+    """Пул запущенных процессов UCI-движка для одной конфигурации ИИ."""
+
+    def __init__(self, ai_name: str, ai_info: dict, size: int = ENGINE_POOL_SIZE):
+        self.ai_name = ai_name
+        self.ai_info = ai_info
+        self.size = size
+        self._idle: List[chess.engine.Protocol] = []
+        self._semaphore = asyncio.Semaphore(size)
+
+    async def _spawn(self) -> chess.engine.Protocol:
+        command = self.ai_info.get("command") or self.ai_info.get("path")
+        if not command:
+            raise ValueError(f"No command or path for UCI engine {self.ai_name}")
+        _, engine = await chess.engine.popen_uci(command)
+        if "skill_level" in self.ai_info:
+            await engine.configure({"Skill Level": self.ai_info["skill_level"]})
+        logger.debug(f"Spawned UCI engine for {self.ai_name}")
+        return engine
+
+    async def _discard(self, engine: chess.engine.Protocol):
+        try:
+            await engine.quit()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Выдаёт движок из пула; сломавшийся движок не возвращается в пул."""
+        async with self._semaphore:
+            engine = self._idle.pop() if self._idle else await self._spawn()
+            try:
+                yield engine
+            except BaseException:
+                await self._discard(engine)
+                raise
+            else:
+                self._idle.append(engine)
+
+    async def warm_up(self, count: int = 1):
+        """Заранее запускает до count процессов движка."""
+        while len(self._idle) < min(count, self.size):
+            self._idle.append(await self._spawn())
+
+    async def close(self):
+        engines, self._idle = self._idle, []
+        for engine in engines:
+            await self._discard(engine)
+
+
+engine_pools: Dict[str, EnginePool] = {}
+
+
+def get_engine_pool(ai_name: str, ai_info: dict, size: int = ENGINE_POOL_SIZE) -> EnginePool:
+    pool = engine_pools.get(ai_name)
+    if pool is None:
+        pool = engine_pools[ai_name] = EnginePool(ai_name, ai_info, size)
+    return pool
+
+
+async def close_engine_pools():
+    for ai_name, pool in list(engine_pools.items()):
+        await pool.close()
+        logger.info(f"Engine pool for {ai_name} closed")
+    engine_pools.clear()
@@ -0,0 +1,571 @@
+"""Numbfish — небольшой шахматный движок на битбордах python-chess.
+
+Альфа-бета с итеративным углублением, таблицей транспозиций по Zobrist-хэшу,
+сортировкой ходов (MVV-LVA, killer-ходы, history) и оценкой по таблицам
+фигура-поле. Используется из chess_ai напрямую (Searcher) или как отдельный
+UCI-процесс:
+
+    python numbfish.py          # UCI-режим
+    python numbfish.py bench 5  # замер узлов в секунду на глубине 5
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+import chess
+
+MATE = 100000
+MATE_THRESHOLD = MATE - 1000
+INFINITY = MATE + 1
+MAX_PLY = 64
+# Запись таблицы транспозиций занимает около 180 байт объектов Python:
+# 1 << 16 записей — примерно 12 МБ на один Searcher
+TT_MAX_ENTRIES = int(os.environ.get("NUMFISH_TT_SIZE", str(1 << 16)))
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+PIECE_VALUES = [0, 100, 320, 330, 500, 900, 0]
+
+# Таблицы фигура-поле с точки зрения белых, строка a8..h8 первой
+PST = {
+    chess.PAWN: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    chess.KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    chess.BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    chess.ROOK: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ],
+    chess.QUEEN: [
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ],
+    chess.KING: [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ],
+}
+
+KING_ENDGAME_PST = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+
+def _square_tables(table: List[int], value: int) -> Tuple[List[int], List[int]]:
+    """Переводит таблицу в индексы python-chess (a1 = 0) для белых и чёрных."""
+    white = [value + table[square ^ 56] for square in chess.SQUARES]
+    black = [value + table[square] for square in chess.SQUARES]
+    return white, black
+
+
+_TABLES = {piece_type: _square_tables(PST[piece_type], PIECE_VALUES[piece_type]) for piece_type in PST}
+_KING_ENDGAME_TABLES = _square_tables(KING_ENDGAME_PST, 0)
+
+# Ключи Zobrist; фиксированное зерно, чтобы хэши совпадали между процессами
+_rng = random.Random(0x5EED)
+PIECE_KEYS = [[[_rng.getrandbits(64) for _ in chess.SQUARES] for _ in range(7)] for _ in chess.COLORS]
+SIDE_KEY = _rng.getrandbits(64)
+CASTLING_KEYS = [_rng.getrandbits(64) for _ in range(16)]
+EP_KEYS = [_rng.getrandbits(64) for _ in range(8)]
+
+
+def _castling_index(board: chess.Board) -> int:
+    rights = board.castling_rights
+    return (
+        bool(rights & chess.BB_H1)
+        | bool(rights & chess.BB_A1) << 1
+        | bool(rights & chess.BB_H8) << 2
+        | bool(rights & chess.BB_A8) << 3
+    )
+
+
+def _state_key(board: chess.Board) -> int:
+    key = CASTLING_KEYS[_castling_index(board)]
+    if board.ep_square is not None:
+        key ^= EP_KEYS[chess.square_file(board.ep_square)]
+    return key
+
+
+def zobrist_hash(board: chess.Board) -> int:
+    """Полный Zobrist-хэш позиции (используется в корне и в тестах)."""
+    h = _state_key(board)
+    if board.turn == chess.BLACK:
+        h ^= SIDE_KEY
+    for square, piece in board.piece_map().items():
+        h ^= PIECE_KEYS[piece.color][piece.piece_type][square]
+    return h
+
+
+def push_with_hash(board: chess.Board, move: chess.Move, h: int) -> int:
+    """Делает ход и инкрементально обновляет хэш вместо полного пересчёта."""
+    color = board.turn
+    keys = PIECE_KEYS[color]
+    piece_type = board.piece_type_at(move.from_square)
+    h ^= SIDE_KEY ^ _state_key(board) ^ keys[piece_type][move.from_square]
+    h ^= keys[move.promotion or piece_type][move.to_square]
+
+    if board.is_castling(move):
+        rank = chess.square_rank(move.from_square)
+        if move.to_square > move.from_square:
+            rook_from, rook_to = chess.square(7, rank), chess.square(5, rank)
+        else:
+            rook_from, rook_to = chess.square(0, rank), chess.square(3, rank)
+        h ^= keys[chess.ROOK][rook_from] ^ keys[chess.ROOK][rook_to]
+    elif board.is_en_passant(move):
+        captured_square = move.to_square - 8 if color == chess.WHITE else move.to_square + 8
+        h ^= PIECE_KEYS[not color][chess.PAWN][captured_square]
+    else:
+        captured = board.piece_type_at(move.to_square)
+        if captured:
+            h ^= PIECE_KEYS[not color][captured][move.to_square]
+
+    board.push(move)
+    return h ^ _state_key(board)
+
+
+def evaluate(board: chess.Board) -> int:
+    """Материал и таблицы фигура-поле в сантипешках с точки зрения стороны, которая ходит."""
+    white_bb = board.occupied_co[chess.WHITE]
+    black_bb = board.occupied_co[chess.BLACK]
+    score = 0
+    for piece_type, bb in (
+        (chess.PAWN, board.pawns), (chess.KNIGHT, board.knights), (chess.BISHOP, board.bishops),
+        (chess.ROOK, board.rooks), (chess.QUEEN, board.queens),
+    ):
+        white_table, black_table = _TABLES[piece_type]
+        for square in chess.scan_forward(bb & white_bb):
+            score += white_table[square]
+        for square in chess.scan_forward(bb & black_bb):
+            score -= black_table[square]
+
+    white_table, black_table = _KING_ENDGAME_TABLES if not board.queens else _TABLES[chess.KING]
+    score += white_table[board.king(chess.WHITE)] - black_table[board.king(chess.BLACK)]
+    return score if board.turn == chess.WHITE else -score
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchResult(NamedTuple):
+    move: Optional[chess.Move]
+    score: int
+    depth: int
+    nodes: int
+    elapsed: float
+    pv: List[chess.Move]
+
+
+class Searcher:
+    """Поиск альфа-бета; таблица транспозиций и history сохраняются между ходами.
+
+    Таблица ограничена tt_max_entries записями: при переполнении вытесняются
+    самые старые.
+    """
+
+    def __init__(self, tt_max_entries: int = TT_MAX_ENTRIES):
+        self.tt: "OrderedDict[int, Tuple[int, int, int, Optional[chess.Move]]]" = OrderedDict()
+        self.tt_max_entries = tt_max_entries
+        self.history = [0] * 4096
+        self.stop_event = threading.Event()
+        self._stop_event = self.stop_event
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.deadline = None
+        self.nodes = 0
+
+    def new_game(self):
+        self.tt.clear()
+        self.history = [0] * 4096
+
+    def search(self, board: chess.Board, movetime: Optional[float] = None, depth: Optional[int] = None,
+               on_iteration: Optional[Callable[[SearchResult], None]] = None,
+               stop_event: Optional[threading.Event] = None) -> SearchResult:
+        """Итеративное углубление до depth или пока не истечёт movetime секунд.
+
+        stop_event — внешний флаг остановки вместо собственного: его можно
+        выставить и до начала поиска, тогда он прервётся на первой проверке.
+        """
+        board = board.copy()
+        if stop_event is None:
+            self.stop_event.clear()
+            stop_event = self.stop_event
+        self._stop_event = stop_event
+        self.nodes = 0
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.history = [value // 8 for value in self.history]
+
+        self.started = time.perf_counter()
+        self.deadline = self.started + movetime if movetime else None
+        max_depth = min(depth or MAX_PLY, MAX_PLY)
+
+        root_hash = zobrist_hash(board)
+        self.path = self._history_hashes(board) + [root_hash]
+        legal_moves = list(board.legal_moves)
+        result = SearchResult(legal_moves[0] if legal_moves else None, 0, 0, 0, 0.0, [])
+        if len(legal_moves) <= 1:
+            return result
+
+        for current_depth in range(1, max_depth + 1):
+            try:
+                score = self._negamax(board, current_depth, -INFINITY, INFINITY, 0, root_hash)
+            except SearchTimeout:
+                break
+            pv = self._principal_variation(board, root_hash, current_depth)
+            result = SearchResult(pv[0] if pv else result.move, score, current_depth, self.nodes,
+                                  time.perf_counter() - self.started, pv)
+            if on_iteration:
+                on_iteration(result)
+            if abs(score) > MATE_THRESHOLD:
+                break
+            # Следующая итерация обычно в несколько раз дольше — не начинаем её впустую
+            if self.deadline and time.perf_counter() - self.started > (self.deadline - self.started) / 2:
+                break
+        return result._replace(nodes=self.nodes, elapsed=time.perf_counter() - self.started)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def quiesce(self, board: chess.Board) -> int:
+        """Оценка после разрешения взятий с точки зрения стороны, которая ходит; без лимита времени."""
+        self.deadline = None
+        self._stop_event = self.stop_event
+        self.stop_event.clear()
+        return self._quiesce(board, -INFINITY, INFINITY, 0)
+
+    @staticmethod
+    def _history_hashes(board: chess.Board) -> List[int]:
+        """Хэши позиций партии для распознавания повторений."""
+        replay = board.root()
+        hashes = []
+        h = zobrist_hash(replay)
+        for move in board.move_stack:
+            hashes.append(h)
+            h = push_with_hash(replay, move, h)
+        return hashes[-board.halfmove_clock:] if board.halfmove_clock else []
+
+    def _check_time(self):
+        if self._stop_event.is_set() or (self.deadline and time.perf_counter() > self.deadline):
+            raise SearchTimeout()
+
+    def _order_moves(self, board: chess.Board, moves, tt_move: Optional[chess.Move], ply: int) -> List[chess.Move]:
+        killers = self.killers[ply]
+        history = self.history
+
+        def key(move: chess.Move) -> int:
+            if move == tt_move:
+                return 10_000_000
+            if board.is_capture(move):
+                victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+                attacker = board.piece_type_at(move.from_square)
+                return 1_000_000 + 10 * victim - attacker
+            if move.promotion:
+                return 900_000 + move.promotion
+            if move == killers[0]:
+                return 800_000
+            if move == killers[1]:
+                return 700_000
+            return history[move.from_square * 64 + move.to_square]
+
+        return sorted(moves, key=key, reverse=True)
+
+    def _negamax(self, board: chess.Board, depth: int, alpha: int, beta: int, ply: int, h: int) -> int:
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self._check_time()
+
+        if ply > 0:
+            if board.halfmove_clock >= 100 or h in self.path[-board.halfmove_clock - 1:-1]:
+                return 0
+            if board.is_insufficient_material():
+                return 0
+
+        tt_move = None
+        entry = self.tt.get(h)
+        if entry is not None:
+            entry_depth, flag, entry_score, tt_move = entry
+            if ply > 0 and entry_depth >= depth:
+                entry_score = _score_from_tt(entry_score, ply)
+                if flag == EXACT:
+                    return entry_score
+                if flag == LOWER and entry_score >= beta:
+                    return entry_score
+                if flag == UPPER and entry_score <= alpha:
+                    return entry_score
+
+        in_check = board.is_check()
+        if in_check and ply < MAX_PLY:
+            depth += 1
+        if depth <= 0 or ply >= MAX_PLY:
+            return self._quiesce(board, alpha, beta, ply)
+
+        moves = list(board.generate_legal_moves())
+        if not moves:
+            return -MATE + ply if in_check else 0
+
+        alpha_original = alpha
+        best_score = -INFINITY
+        best_move = None
+        for move in self._order_moves(board, moves, tt_move, ply):
+            quiet = not board.is_capture(move) and not move.promotion
+            child_hash = push_with_hash(board, move, h)
+            self.path.append(child_hash)
+            try:
+                score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1, child_hash)
+            finally:
+                self.path.pop()
+                board.pop()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if quiet:
+                    killers = self.killers[ply]
+                    if killers[0] != move:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                    self.history[move.from_square * 64 + move.to_square] += depth * depth
+                break
+
+        if best_score <= alpha_original:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self._store(h, (depth, flag, _score_to_tt(best_score, ply), best_move))
+        return best_score
+
+    def _store(self, h: int, entry: Tuple[int, int, int, Optional[chess.Move]]):
+        tt = self.tt
+        if h not in tt and len(tt) >= self.tt_max_entries:
+            tt.popitem(last=False)
+        tt[h] = entry
+
+    def _quiesce(self, board: chess.Board, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self._check_time()
+
+        stand_pat = evaluate(board)
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        for move in self._order_moves(board, board.generate_legal_captures(), None, ply):
+            board.push(move)
+            score = -self._quiesce(board, -beta, -alpha, ply + 1)
+            board.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _principal_variation(self, board: chess.Board, h: int, depth: int) -> List[chess.Move]:
+        pv = []
+        board = board.copy(stack=False)
+        seen = set()
+        while len(pv) < depth and h not in seen:
+            seen.add(h)
+            entry = self.tt.get(h)
+            if entry is None or entry[3] is None or not board.is_legal(entry[3]):
+                break
+            pv.append(entry[3])
+            h = push_with_hash(board, entry[3], h)
+        return pv
+
+
+def _score_to_tt(score: int, ply: int) -> int:
+    """Маты хранятся относительно узла, а не корня, чтобы их можно было переиспользовать."""
+    if score > MATE_THRESHOLD:
+        return score + ply
+    if score < -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score: int, ply: int) -> int:
+    if score > MATE_THRESHOLD:
+        return score - ply
+    if score < -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+BENCH_FENS = [
+    chess.STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP2BPPP/R2QKB1R w KQ - 0 8",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1",
+]
+
+
+def bench(depth: int = 4) -> Tuple[int, float]:
+    """Фиксированный поиск по набору позиций; возвращает узлы и затраченное время."""
+    nodes = 0
+    elapsed = 0.0
+    for fen in BENCH_FENS:
+        result = Searcher().search(chess.Board(fen), depth=depth)
+        nodes += result.nodes
+        elapsed += result.elapsed
+    return nodes, elapsed
+
+
+def _uci_score(score: int) -> str:
+    if score > MATE_THRESHOLD:
+        return f"mate {(MATE - score + 1) // 2}"
+    if score < -MATE_THRESHOLD:
+        return f"mate {-(MATE + score) // 2}"
+    return f"cp {score}"
+
+
+def _go_budget(board: chess.Board, args: List[str]) -> Tuple[Optional[float], Optional[int]]:
+    params = {}
+    for name, value in zip(args, args[1:]):
+        if name in ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo"):
+            params[name] = int(value)
+    if "depth" in params:
+        return params.get("movetime", 0) / 1000 or None, params["depth"]
+    if "movetime" in params:
+        return params["movetime"] / 1000, None
+    remaining = params.get("wtime" if board.turn == chess.WHITE else "btime")
+    if remaining is not None:
+        increment = params.get("winc" if board.turn == chess.WHITE else "binc", 0)
+        budget = remaining / params.get("movestogo", 30) + increment / 2
+        return max(min(budget, remaining / 2), 10) / 1000, None
+    if "infinite" in args:
+        return None, MAX_PLY
+    return 1.0, None
+
+
+def uci_loop(stdin=sys.stdin, stdout=sys.stdout):
+    def send(line: str):
+        stdout.write(line + "\n")
+        stdout.flush()
+
+    searcher = Searcher()
+    board = chess.Board()
+    thread: Optional[threading.Thread] = None
+
+    def run_search(position: chess.Board, movetime: Optional[float], depth: Optional[int]):
+        def report(result: SearchResult):
+            nps = int(result.nodes / result.elapsed) if result.elapsed else 0
+            pv = " ".join(move.uci() for move in result.pv)
+            send(f"info depth {result.depth} score {_uci_score(result.score)} nodes {result.nodes} "
+                 f"nps {nps} time {int(result.elapsed * 1000)} pv {pv}")
+
+        result = searcher.search(position, movetime=movetime, depth=depth, on_iteration=report)
+        send(f"bestmove {result.move.uci() if result.move else '0000'}")
+
+    for line in stdin:
+        tokens = line.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+        if command == "uci":
+            send("id name Numbfish")
+            send("id author MY_WEB_CHESS")
+            send("uciok")
+        elif command == "isready":
+            send("readyok")
+        elif command == "ucinewgame":
+            searcher.new_game()
+        elif command == "position":
+            if len(tokens) > 1 and tokens[1] == "startpos":
+                board = chess.Board()
+                rest = tokens[2:]
+            elif len(tokens) > 7 and tokens[1] == "fen":
+                board = chess.Board(" ".join(tokens[2:8]))
+                rest = tokens[8:]
+            else:
+                continue
+            if rest and rest[0] == "moves":
+                for uci in rest[1:]:
+                    board.push_uci(uci)
+        elif command == "go":
+            if thread and thread.is_alive():
+                continue
+            movetime, depth = _go_budget(board, tokens[1:])
+            thread = threading.Thread(target=run_search, args=(board.copy(), movetime, depth), daemon=True)
+            thread.start()
+        elif command == "stop":
+            searcher.stop()
+            if thread:
+                thread.join()
+        elif command == "quit":
+            searcher.stop()
+            if thread:
+                thread.join()
+            break
+
+
+def main(argv: List[str]):
+    if len(argv) > 1 and argv[1] == "bench":
+        depth = int(argv[2]) if len(argv) > 2 else 4
+        nodes, elapsed = bench(depth)
+        print(f"depth {depth} nodes {nodes} time {elapsed:.2f}s nps {int(nodes / elapsed) if elapsed else 0}")
+        return
+    uci_loop()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
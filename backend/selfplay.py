@@ -0,0 +1,213 @@
+"""Генерация обучающих позиций для custom_light партиями ИИ против ИИ.
+
+Пример запуска:
+    python selfplay.py --games 200 --workers 4 --white stockfish --black stockfish --out data/selfplay
+
+Каждая позиция кодируется так же, как в board_to_input (8x8x14), и получает
+метки from/to — ход, сыгранный поисковым движком (UCI или numbfish). Ходы
+keras-модели не размечаются, чтобы модель не училась на собственных
+предсказаниях. Данные пишутся шардами .npy, которые ShardDataset читает через
+memory map без загрузки в память.
+"""
+import argparse
+import glob
+import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import chess
+import chess.engine
+import numpy as np
+
+from chess_ai import available_ais, board_to_input, get_best_move_keras
+from engines.numbfish.numbfish import Searcher
+
+logger = logging.getLogger(__name__)
+
+SHARD_PATTERN = "shard-{:05d}.{}.npy"
+SEARCH_AI_TYPES = ("uci", "numfish")
+
+
+class Player:
+    """Игрок партии: поисковый движок (ходы размечаются) или keras-модель (не размечаются)."""
+
+    def __init__(self, ai_name: str, depth: Optional[int] = None):
+        self.ai_name = ai_name
+        self.ai_info = available_ais[ai_name]
+        self.depth = depth or self.ai_info.get("depth")
+        self.engine = None
+        self.searcher = None
+        self.labels = self.ai_info["type"] in SEARCH_AI_TYPES
+        if self.ai_info["type"] == "numfish":
+            self.searcher = Searcher()
+        elif self.labels:
+            command = self.ai_info.get("command") or self.ai_info.get("path")
+            self.engine = chess.engine.SimpleEngine.popen_uci(command)
+            if "skill_level" in self.ai_info:
+                self.engine.configure({"Skill Level": self.ai_info["skill_level"]})
+            self.limit = chess.engine.Limit(depth=self.depth or 3)
+
+    def choose(self, board: chess.Board) -> Optional[chess.Move]:
+        if self.engine is not None:
+            return self.engine.play(board, self.limit).move
+        if self.searcher is not None:
+            movetime = self.ai_info.get("movetime") if self.depth is None else None
+            return self.searcher.search(board, movetime=movetime, depth=self.depth).move
+        return get_best_move_keras(board, self.ai_info)
+
+    def close(self):
+        if self.engine is not None:
+            self.engine.quit()
+
+
+def play_game(players: Dict[bool, Player], rng: random.Random, random_plies: int = 4,
+              max_plies: int = 200) -> Tuple[List[np.ndarray], List[int], List[int]]:
+    """Играет одну партию и возвращает размеченные позиции."""
+    board = chess.Board()
+    for _ in range(random_plies):
+        if board.is_game_over():
+            break
+        board.push(rng.choice(list(board.legal_moves)))
+
+    positions, from_squares, to_squares = [], [], []
+    while not board.is_game_over() and board.ply() < max_plies:
+        player = players[board.turn]
+        move = player.choose(board)
+        if move is None or move not in board.legal_moves:
+            logger.warning(f"{player.ai_name} returned invalid move {move}, game aborted")
+            break
+        if player.labels:
+            positions.append(board_to_input(board, "selfplay")[0])
+            from_squares.append(move.from_square)
+            to_squares.append(move.to_square)
+        board.push(move)
+    return positions, from_squares, to_squares
+
+
+def write_shard(out_dir: str, index: int, positions: np.ndarray,
+                from_squares: np.ndarray, to_squares: np.ndarray) -> str:
+    """Атомарно пишет шард: сначала во временные файлы, затем переименовывает."""
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = {
+        "x": positions.astype(np.float32),
+        "from": from_squares.astype(np.int16),
+        "to": to_squares.astype(np.int16),
+    }
+    for name, array in arrays.items():
+        path = os.path.join(out_dir, SHARD_PATTERN.format(index, name))
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, array)
+        os.replace(path + ".tmp", path)
+    return os.path.join(out_dir, SHARD_PATTERN.format(index, "x"))
+
+
+def generate_shard(index: int, games: int, white: str, black: str, out_dir: str,
+                   depth: Optional[int], random_plies: int, max_plies: int, seed: int) -> Tuple[str, int]:
+    """Задача для процесса пула: играет games партий и пишет один шард."""
+    rng = random.Random(seed + index)
+    players: Dict[bool, Player] = {}
+    positions, from_squares, to_squares = [], [], []
+    try:
+        # Внутри try: если второй движок не запустится, первый всё равно будет закрыт
+        players[chess.WHITE] = Player(white, depth)
+        players[chess.BLACK] = players[chess.WHITE] if black == white else Player(black, depth)
+        for _ in range(games):
+            x, f, t = play_game(players, rng, random_plies, max_plies)
+            positions += x
+            from_squares += f
+            to_squares += t
+    finally:
+        for player in set(players.values()):
+            player.close()
+
+    x = np.stack(positions) if positions else np.zeros((0, 8, 8, 14), dtype=np.float32)
+    path = write_shard(out_dir, index, x, np.array(from_squares), np.array(to_squares))
+    return path, len(positions)
+
+
+class ShardDataset:
+    """Потоковый загрузчик шардов без tf.data: батчи читаются из memory map."""
+
+    def __init__(self, data_dir: str, batch_size: int = 256, shuffle: bool = True, seed: int = 0):
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        self.shards = []
+        for x_path in sorted(glob.glob(os.path.join(data_dir, "shard-*.x.npy"))):
+            prefix = x_path[:-len(".x.npy")]
+            x = np.load(x_path, mmap_mode="r")
+            if len(x):
+                self.shards.append((
+                    x,
+                    np.load(prefix + ".from.npy", mmap_mode="r"),
+                    np.load(prefix + ".to.npy", mmap_mode="r"),
+                ))
+
+    @property
+    def num_positions(self) -> int:
+        return sum(len(x) for x, _, _ in self.shards)
+
+    def __len__(self) -> int:
+        return sum(-(-len(x) // self.batch_size) for x, _, _ in self.shards)
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, Tuple[np.ndarray, np.ndarray]]]:
+        order = self.rng.permutation(len(self.shards)) if self.shuffle else range(len(self.shards))
+        for shard_index in order:
+            x, from_squares, to_squares = self.shards[shard_index]
+            indices = self.rng.permutation(len(x)) if self.shuffle else np.arange(len(x))
+            for start in range(0, len(x), self.batch_size):
+                # Сортировка внутри батча — последовательное чтение страниц memory map
+                batch = np.sort(indices[start:start + self.batch_size])
+                yield (
+                    np.asarray(x[batch]),
+                    (np.asarray(from_squares[batch], dtype=np.int64),
+                     np.asarray(to_squares[batch], dtype=np.int64)),
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Self-play data generation for custom_light")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--games-per-shard", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--white", default="stockfish", choices=sorted(available_ais))
+    parser.add_argument("--black", default="stockfish", choices=sorted(available_ais))
+    parser.add_argument("--depth", type=int, default=None, help="override engine search depth")
+    parser.add_argument("--random-plies", type=int, default=4)
+    parser.add_argument("--max-plies", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="data/selfplay")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    # chess_ai пишет DEBUG на каждую закодированную позицию
+    logging.getLogger("chess_ai").setLevel(logging.INFO)
+
+    if not {available_ais[args.white]["type"], available_ais[args.black]["type"]} & set(SEARCH_AI_TYPES):
+        parser.error("at least one side must be a search engine to label positions")
+
+    shard_games = [args.games_per_shard] * (args.games // args.games_per_shard)
+    if args.games % args.games_per_shard:
+        shard_games.append(args.games % args.games_per_shard)
+
+    started = time.perf_counter()
+    total = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(generate_shard, index, games, args.white, args.black, args.out,
+                            args.depth, args.random_plies, args.max_plies, args.seed)
+            for index, games in enumerate(shard_games)
+        ]
+        for future in as_completed(futures):
+            path, count = future.result()
+            total += count
+            logger.info(f"Shard {path}: {count} positions")
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Generated {total} positions in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} pos/s)")
+
+
+if __name__ == "__main__":
+    main()
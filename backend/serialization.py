@@ -0,0 +1,78 @@
+import gzip
+import json
+import os
+from typing import Dict, Optional
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен, стандартный json медленнее, но совместим
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Ответы меньше порога не сжимаются: выигрыш в байтах меньше затрат CPU
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> str:
+    """Выбирает br или gzip по заголовку Accept-Encoding; иначе identity."""
+    if not accept_encoding:
+        return "identity"
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def encoded_response(body: bytes, accept_encoding: Optional[str],
+                     cache: Optional[Dict[str, bytes]] = None) -> Response:
+    """Ответ из готовых байтов без повторной валидации и сериализации.
+
+    cache хранит уже сжатые варианты тела по кодировке, чтобы одинаковый
+    ответ для многих клиентов сжимался один раз.
+    """
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= COMPRESSION_MIN_BYTES else "identity"
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+        if cache is not None and encoding in cache:
+            body = cache[encoding]
+        else:
+            body = compress(body, encoding)
+            if cache is not None:
+                cache[encoding] = body
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+import chess
+import chess.engine
+from unittest.mock import patch, AsyncMock
+from backend import analysis
+from backend.analysis import EvalCache, analyse_position, board_at_ply, eval_cache, ANALYSIS_MAX_CONCURRENCY
+from backend.chess_ai import get_best_move
+from backend.engine_pool import EnginePool
+
+STOCKFISH = {"type": "uci", "path": "/usr/games/stockfish", "depth": 3, "skill_level": 20}
+
+@pytest.fixture(autouse=True)
+def reset_analysis(monkeypatch):
+    eval_cache.clear()
+    monkeypatch.setattr(analysis, "_analysis_semaphore", None)
+
+def test_eval_cache_lru():
+    cache = EvalCache(max_size=2)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    cache.get("a")
+    cache.put("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert len(cache) == 2
+
+def test_board_at_ply(new_board):
+    for uci in ["e2e4", "e7e5", "g1f3"]:
+        new_board.push_uci(uci)
+    position = board_at_ply(new_board, 1)
+    assert position.fen() == "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+    assert len(new_board.move_stack) == 3
+
+@pytest.mark.asyncio
+async def test_analyse_position_uses_cache(new_board):
+    info = {
+        "score": chess.engine.PovScore(chess.engine.Cp(35), chess.WHITE),
+        "depth": 10,
+        "pv": [chess.Move.from_uci("e2e4"), chess.Move.from_uci("e7e5")],
+    }
+    pool = EnginePool("stockfish", STOCKFISH)
+    with patch('chess.engine.popen_uci', new_callable=AsyncMock) as mock_popen, \
+            patch('backend.analysis.get_engine_pool', return_value=pool):
+        mock_engine = AsyncMock()
+        mock_popen.return_value = (None, mock_engine)
+        mock_engine.analyse.return_value = [info]
+
+        first = await analyse_position(new_board, "stockfish", STOCKFISH, depth=10)
+        second = await analyse_position(new_board, "stockfish", STOCKFISH, depth=10)
+
+    assert first["score"] == {"cp": 35, "mate": None}
+    assert first["best_move"] == "e2e4"
+    assert first["lines"][0]["pv_san"] == "1. e4 e5"
+    assert not first["cached"] and second["cached"]
+    assert mock_engine.analyse.await_count == 1
+
+@pytest.mark.asyncio
+async def test_analysis_does_not_starve_game_moves(new_board, monkeypatch):
+    monkeypatch.setattr("engine_pool.engine_pools", {})
+    release = asyncio.Event()
+
+    async def slow_analyse(*args, **kwargs):
+        await release.wait()
+        return []
+
+    def spawn_engine(*args, **kwargs):
+        engine = AsyncMock()
+        engine.analyse.side_effect = slow_analyse
+        engine.play.return_value = AsyncMock(move=chess.Move.from_uci("e2e4"))
+        return (None, engine)
+
+    with patch('chess.engine.popen_uci', new_callable=AsyncMock, side_effect=spawn_engine):
+        # Анализы занимают весь семафор и держат свои движки
+        pending = [
+            asyncio.ensure_future(analyse_position(new_board, "stockfish", STOCKFISH, depth=depth))
+            for depth in range(1, ANALYSIS_MAX_CONCURRENCY + 2)
+        ]
+        await asyncio.sleep(0.01)
+        assert analysis._get_semaphore().locked()
+
+        move = await asyncio.wait_for(get_best_move(new_board, "stockfish"), timeout=1)
+        release.set()
+        await asyncio.gather(*pending)
+
+    assert move.uci() == "e2e4"
+
+@pytest.mark.asyncio
+async def test_cache_hit_uses_requested_move_counters(new_board):
+    info = {
+        "score": chess.engine.PovScore(chess.engine.Cp(35), chess.WHITE),
+        "depth": 10,
+        "pv": [chess.Move.from_uci("e2e4"), chess.Move.from_uci("e7e5")],
+    }
+    pool = EnginePool("stockfish", STOCKFISH)
+    with patch('chess.engine.popen_uci', new_callable=AsyncMock) as mock_popen, \
+            patch('backend.analysis.get_engine_pool', return_value=pool):
+        mock_engine = AsyncMock()
+        mock_popen.return_value = (None, mock_engine)
+        mock_engine.analyse.return_value = [info]
+
+        await analyse_position(new_board, "stockfish", STOCKFISH, depth=10)
+        # Та же позиция после 1.Nf3 Nf6 2.Ng1 Ng8 — другой счётчик ходов
+        board = chess.Board()
+        for uci in ["g1f3", "g8f6", "f3g1", "f6g8"]:
+            board.push_uci(uci)
+        result = await analyse_position(board, "stockfish", STOCKFISH, depth=10)
+
+    assert result["cached"]
+    assert result["fen"] == "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 4 3"
+    assert result["lines"][0]["pv_san"] == "3. e4 e5"
+    assert mock_engine.analyse.await_count == 1
@@ -1,5 +1,10 @@
+import asyncio
+import json
+import chess
 import pytest
 from fastapi import status
+from fastapi.testclient import TestClient
+from backend.app import app, games, watch_game, make_ai_move
 
 def test_start_game(test_client):
     response = test_client.post("/api/game/start", json={
@@ -54,3 +59,108 @@ def test_get_ai_models(test_client):
     data = response.json()
     assert "models" in data
     assert "stockfish" in data["models"]
+
+def test_health_ready_before_warm_up(test_client):
+    response = test_client.get("/health/ready")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["ready"] is False
+
+def test_health_ready_after_warm_up(monkeypatch):
+    async def fake_warm_up():
+        return {"stockfish": 0.01}, {}
+    monkeypatch.setattr("backend.app.warm_up_ais", fake_warm_up)
+    with TestClient(app) as client:
+        response = client.get("/health/ready")
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["ready"] is True
+    assert "import" in data["timings"]
+    assert "warm_up" in data["timings"]
+    assert data["timings"]["stockfish"] == 0.01
+
+def test_get_state_since(test_client, game_id):
+    for from_square, to_square in [("e2", "e4"), ("e7", "e5")]:
+        test_client.post("/api/game/move", json={
+            "game_id": game_id, "from_square": from_square, "to_square": to_square
+        })
+    response = test_client.get(f"/api/game/state?game_id={game_id}&since=1")
+    assert response.json()["moves"] == ["e7e5"]
+
+def test_get_state_compressed(test_client, game_id, monkeypatch):
+    monkeypatch.setattr("serialization.COMPRESSION_MIN_BYTES", 0)
+    response = test_client.get(f"/api/game/state?game_id={game_id}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["turn"] == "белые"
+
+def test_full_game_analysis_reports_engine_error(test_client, game_id, monkeypatch):
+    import chess.engine
+    for from_square, to_square in [("e2", "e4"), ("e7", "e5")]:
+        test_client.post("/api/game/move", json={
+            "game_id": game_id, "from_square": from_square, "to_square": to_square
+        })
+    calls = []
+
+    async def flaky_analyse_position(board, engine_name, ai_info, depth, multipv=1):
+        calls.append(board.fen())
+        if len(calls) == 2:
+            raise chess.engine.EngineTerminatedError("engine died")
+        return {"fen": board.fen(), "score": {"cp": 0, "mate": None}, "lines": [], "cached": False}
+
+    monkeypatch.setattr("analysis.analyse_position", flaky_analyse_position)
+    response = test_client.get(f"/api/game/analyze?game_id={game_id}&full_game=true")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert response.status_code == status.HTTP_200_OK
+    assert lines[0]["ply"] == 0
+    assert lines[-1]["ply"] == 1
+    assert "error" in lines[-1]
+    assert len(lines) == 2
+
+async def _next_state(frames):
+    frame = await asyncio.wait_for(frames.__anext__(), timeout=1)
+    return json.loads(frame.split(b"data: ", 1)[1])
+
+@pytest.mark.asyncio
+async def test_watch_frames_across_ai_move(test_client, monkeypatch):
+    game_id = test_client.post("/api/game/start", json={
+        "mode": "pvai", "player1": "Player1", "ai_black": "stockfish"
+    }).json()["game_id"]
+    game = games[game_id]
+    game["board"].push_uci("e2e4")
+    game["moves"].append("e2e4")
+    thinking = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_best_move(board, ai_name):
+        thinking.set()
+        await release.wait()
+        return chess.Move.from_uci("e7e5")
+
+    monkeypatch.setattr("backend.app.get_best_move", slow_best_move)
+    frames = (await watch_game(game_id)).body_iterator
+
+    state = await _next_state(frames)
+    assert state["moves"] == ["e2e4"] and state["ai_thinking"] is False
+
+    task = asyncio.create_task(make_ai_move(game_id))
+    await thinking.wait()
+    state = await _next_state(frames)
+    assert state["moves"] == ["e2e4"] and state["ai_thinking"] is True
+
+    release.set()
+    await task
+    state = await _next_state(frames)
+    assert state["moves"] == ["e2e4", "e7e5"] and state["ai_thinking"] is False
+    await frames.aclose()
+
+@pytest.mark.asyncio
+async def test_watch_finished_game_sends_end_event(test_client):
+    game_id = test_client.post("/api/game/start", json={
+        "mode": "pvai", "player1": "Player1", "ai_black": "stockfish"
+    }).json()["game_id"]
+    games[game_id]["game_over"] = True
+    frames = (await watch_game(game_id)).body_iterator
+
+    frame = await asyncio.wait_for(frames.__anext__(), timeout=1)
+    assert b"\nevent: end\n" in frame
+    with pytest.raises(StopAsyncIteration):
+        await asyncio.wait_for(frames.__anext__(), timeout=1)
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from backend.broadcast import GameHub, HubFull
+
+@pytest.mark.asyncio
+async def test_frames_are_shared_between_spectators():
+    hub = GameHub("game", max_lag=4)
+    hub.publish(b'{"ply":0}')
+    first, second = hub.subscribe(), hub.subscribe()
+    frame_a = await first.__anext__()
+    frame_b = await second.__anext__()
+    assert frame_a is frame_b
+    assert frame_a == b'id: 1\ndata: {"ply":0}\n\n'
+    assert hub.spectators == 2
+
+@pytest.mark.asyncio
+async def test_slow_spectator_drops_to_latest():
+    hub = GameHub("game", max_lag=2)
+    hub.publish(b"0")
+    stream = hub.subscribe()
+    assert await stream.__anext__() == b"id: 1\ndata: 0\n\n"
+    for ply in range(1, 6):
+        hub.publish(str(ply).encode())
+    assert await stream.__anext__() == b"id: 6\ndata: 5\n\n"
+    assert hub.dropped == 4
+    assert len(hub.frames) == 2
+
+@pytest.mark.asyncio
+async def test_waiting_spectator_is_woken_and_closed():
+    hub = GameHub("game")
+    stream = hub.subscribe()
+    waiter = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0)
+    hub.publish(b"1")
+    assert await waiter == b"id: 1\ndata: 1\n\n"
+    hub.close()
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
+    assert hub.spectators == 0
+
+@pytest.mark.asyncio
+async def test_spectator_limit():
+    hub = GameHub("game", max_spectators=1)
+    hub.publish(b"0")
+    stream = hub.subscribe()
+    await stream.__anext__()
+    with pytest.raises(HubFull):
+        hub.subscribe()
+    await stream.aclose()
+    assert hub.spectators == 0
+
+@pytest.mark.asyncio
+async def test_unread_stream_does_not_hold_a_slot():
+    hub = GameHub("game", max_spectators=1)
+    await hub.subscribe().aclose()
+    assert hub.spectators == 0
+    hub.subscribe()
+
+def test_burst_over_limit_is_rejected_before_reading():
+    hub = GameHub("game", max_spectators=2)
+    streams = [hub.subscribe(), hub.subscribe()]
+    with pytest.raises(HubFull):
+        hub.subscribe()
+    del streams[0]
+    assert hub.spectators == 1
+    hub.subscribe()
+
+def test_named_event_frame():
+    hub = GameHub("game")
+    hub.publish(b"{}", event="end")
+    assert hub.frames[-1][1] == b"id: 1\nevent: end\ndata: {}\n\n"
+
+def test_memory_limit():
+    hub = GameHub("game", max_lag=100, max_bytes=100)
+    for _ in range(10):
+        hub.publish(b"x" * 40)
+    assert hub.memory_bytes <= 100
@@ -1,8 +1,11 @@
+import asyncio
 import pytest
 import chess
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, AsyncMock
-from backend.chess_ai import get_best_move, board_to_input, predictions_to_move, ChessAIModel
+from backend import chess_ai
+from backend.chess_ai import get_best_move, board_to_input, predictions_to_move, policy_search, ChessAIModel
 
 @pytest.mark.asyncio
 async def test_get_best_move_stockfish():
@@ -17,6 +20,19 @@ async def test_get_best_move_stockfish():
         move = await get_best_move(board, "stockfish")
         assert move.uci() == "e2e4"
 
+@pytest.mark.asyncio
+async def test_cancelled_numfish_move_stops_search(new_board, monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(chess_ai, "numfish_executor", executor)
+    task = asyncio.ensure_future(chess_ai.run_numfish(new_board, {"type": "numfish", "depth": 30}))
+    await asyncio.sleep(0.1)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    # Единственный поток пула освобождается, а не ищет на глубину 30
+    await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(executor, lambda: None), timeout=1)
+    executor.shutdown()
+
 def test_board_to_input_shape(new_board):
     input_data = board_to_input(new_board, "custom_light")
     assert input_data.shape == (1, 8, 8, 14)
@@ -43,4 +59,50 @@ def test_chess_ai_model():
     
     model = ChessAIModel(MockModel())
     predictions = model.predict(np.zeros((1, 8, 8, 14)))
-    assert len(predictions) == 2
\ No newline at end of file
+    assert len(predictions) == 2
+
+class PolicyModel:
+    """Фиктивная политика, которая всегда предпочитает ход a2a3."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, batch):
+        self.calls.append(len(batch))
+        from_probs = np.full((len(batch), 64), 0.1)
+        to_probs = np.full((len(batch), 64), 0.1)
+        from_probs[:, chess.A2] = 1.0
+        to_probs[:, chess.A3] = 1.0
+        return from_probs, to_probs
+
+def test_policy_search_batches_layers():
+    board = chess.Board("rnb1kbnr/pppp1ppp/8/4p1q1/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+    model = PolicyModel()
+    move = policy_search(board, model, depth=2, width=30)
+    assert move.uci() == "f3g5"
+    assert model.calls == [1, board.legal_moves.count()]
+
+def test_policy_search_prefers_policy_on_equal_scores(new_board):
+    move = policy_search(new_board, PolicyModel(), depth=1, width=1)
+    assert move.uci() == "a2a3"
+
+def test_policy_search_respects_movetime(new_board):
+    model = PolicyModel()
+    move = policy_search(new_board, model, depth=6, width=20, movetime=0.05)
+    assert move in new_board.legal_moves
+    assert len(model.calls) < 6
+
+class CapturePolicyModel:
+    """Политика, которая сильнее всего хочет взять защищённую пешку ферзём e1-e5."""
+
+    def predict(self, batch):
+        from_probs = np.full((len(batch), 64), 0.1)
+        to_probs = np.full((len(batch), 64), 0.1)
+        from_probs[:, chess.E1] = 1.0
+        to_probs[:, chess.E5] = 1.0
+        return from_probs, to_probs
+
+def test_policy_search_avoids_losing_capture_at_horizon():
+    board = chess.Board("4k3/8/3p4/4p3/8/8/8/4QK2 w - - 0 1")
+    move = policy_search(board, CapturePolicyModel(), depth=1, width=4)
+    assert move != chess.Move.from_uci("e1e5")
@@ -0,0 +1,60 @@
+import io
+import random
+import threading
+import chess
+from backend.engines.numbfish.numbfish import (
+    Searcher, evaluate, zobrist_hash, push_with_hash, uci_loop,
+)
+
+def test_incremental_hash_matches_full_hash():
+    rng = random.Random(7)
+    for fen in [chess.STARTING_FEN, "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"]:
+        board = chess.Board(fen)
+        h = zobrist_hash(board)
+        for _ in range(60):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            h = push_with_hash(board, rng.choice(moves), h)
+            assert h == zobrist_hash(board)
+
+def test_evaluate_symmetric(new_board):
+    assert evaluate(new_board) == 0
+    new_board.push_uci("e2e4")
+    assert evaluate(new_board) < 0  # чёрные ходят и оценивают позицию хуже
+
+def test_finds_mate_in_one():
+    board = chess.Board("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1")
+    result = Searcher().search(board, depth=3)
+    assert result.move == chess.Move.from_uci("d1d8")
+
+def test_wins_hanging_queen():
+    board = chess.Board("rnb1kbnr/pppp1ppp/8/4p1q1/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3")
+    result = Searcher().search(board, depth=3)
+    assert result.move == chess.Move.from_uci("f3g5")
+
+def test_respects_time_budget(new_board):
+    result = Searcher().search(new_board, movetime=0.2)
+    assert result.move in new_board.legal_moves
+    assert result.elapsed < 1.0
+
+def test_transposition_table_is_bounded(new_board):
+    searcher = Searcher(tt_max_entries=100)
+    searcher.search(new_board, depth=4)
+    assert 0 < len(searcher.tt) <= 100
+
+def test_external_stop_event(new_board):
+    stop_event = threading.Event()
+    stop_event.set()
+    result = Searcher().search(new_board, depth=30, stop_event=stop_event)
+    assert result.move in new_board.legal_moves
+    assert result.elapsed < 1.0
+
+def test_uci_loop():
+    stdin = io.StringIO("uci\nisready\nposition startpos moves e2e4\ngo depth 2\nquit\n")
+    stdout = io.StringIO()
+    uci_loop(stdin, stdout)
+    lines = stdout.getvalue().splitlines()
+    assert "uciok" in lines
+    assert "readyok" in lines
+    assert lines[-1].startswith("bestmove ")
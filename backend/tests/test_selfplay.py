@@ -0,0 +1,59 @@
+import random
+import chess
+import numpy as np
+import pytest
+from unittest.mock import patch
+from backend import selfplay
+from backend.selfplay import play_game, write_shard, ShardDataset
+
+class RandomPlayer:
+    ai_name = "random"
+    labels = True
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def choose(self, board):
+        return self.rng.choice(list(board.legal_moves))
+
+def test_play_game_labels_positions():
+    rng = random.Random(1)
+    player = RandomPlayer(rng)
+    positions, from_squares, to_squares = play_game(
+        {chess.WHITE: player, chess.BLACK: player}, rng, random_plies=2, max_plies=12
+    )
+    assert len(positions) == len(from_squares) == len(to_squares) == 10
+    assert positions[0].shape == (8, 8, 14)
+
+def test_shard_roundtrip(tmp_path):
+    for index, count in enumerate([5, 3]):
+        x = np.random.rand(count, 8, 8, 14).astype(np.float32)
+        write_shard(str(tmp_path), index, x, np.arange(count), np.arange(count) + 8)
+
+    dataset = ShardDataset(str(tmp_path), batch_size=2, shuffle=True, seed=0)
+    assert dataset.num_positions == 8
+    assert len(dataset) == 5
+
+    batches = list(dataset)
+    assert len(batches) == 5
+    assert sum(len(x) for x, _ in batches) == 8
+    for x, (from_squares, to_squares) in batches:
+        assert x.shape[1:] == (8, 8, 14)
+        assert np.array_equal(to_squares, from_squares + 8)
+
+def test_generate_shard_closes_started_engine(tmp_path):
+    started = []
+
+    class FailingPlayer:
+        def __init__(self, ai_name, depth=None):
+            if ai_name == "broken":
+                raise FileNotFoundError(ai_name)
+            self.closed = False
+            started.append(self)
+
+        def close(self):
+            self.closed = True
+
+    with patch.object(selfplay, "Player", FailingPlayer), pytest.raises(FileNotFoundError):
+        selfplay.generate_shard(0, 1, "stockfish", "broken", str(tmp_path), None, 0, 10, 0)
+    assert len(started) == 1 and started[0].closed
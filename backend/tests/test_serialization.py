@@ -0,0 +1,12 @@
+import gzip
+from backend.serialization import negotiate_encoding, compress, dumps, brotli
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) == "identity"
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity") == "identity"
+    assert negotiate_encoding("br") == ("br" if brotli is not None else "identity")
+
+def test_compress_gzip_roundtrip():
+    body = dumps({"moves": ["e2e4"] * 100, "turn": "белые"})
+    assert gzip.decompress(compress(body, "gzip")) == body
@@ -83,12 +83,40 @@ const App = () => {
         }
       };
       
+      let interval = null;
+      const startPolling = () => {
+        if (!interval) interval = setInterval(fetchState, 1000);
+      };
+
       fetchState();
       fetchGameScore();
-      const interval = setInterval(fetchState, 1000);
-      return () => clearInterval(interval);
+
+      // Партию ИИ против ИИ смотрим через общий SSE-поток; опрос раз в секунду
+      // остаётся запасным вариантом, если поток недоступен (ошибка или 503)
+      let source = null;
+      if (mode === 'aivai' && typeof EventSource !== 'undefined') {
+        source = new EventSource(`${API_BASE_URL}/api/game/watch?game_id=${gameId}`);
+        source.onmessage = (event) => setGameState(JSON.parse(event.data));
+        source.addEventListener('end', (event) => {
+          // Партия завершена: закрываем поток, иначе браузер будет переподключаться
+          setGameState(JSON.parse(event.data));
+          source.close();
+        });
+        source.onerror = () => {
+          source.close();
+          fetchState();
+          startPolling();
+        };
+      } else {
+        startPolling();
+      }
+
+      return () => {
+        if (source) source.close();
+        if (interval) clearInterval(interval);
+      };
     }
-  }, [gameId]);
+  }, [gameId, mode]);
 
   const handleRestart = () => {
     if (lastConfig) {